@@ -4,94 +4,429 @@ NoBack v4 - Interface clara com botões centralizados e instalação automática
 Salve como noback_v4.py e execute.
 
 Dependências (instaladas automaticamente no venv):
-  rembg, pillow, onnxruntime, tkinterdnd2
+  rembg, pillow, onnxruntime, onnx, tkinterdnd2, deflate
 """
 import os
 import sys
 import subprocess
 from pathlib import Path
-import threading
 
 # ---------------------------
 # Virtualenv / instalação automática
 # ---------------------------
 VENV_DIR = os.path.expanduser("~/.noback_venv")
 PYTHON_BIN = os.path.join(VENV_DIR, "bin", "python3")
+# Marca de dependências já instaladas; mude o sufixo ao alterar a lista do pip.
+DEPS_STAMP = os.path.join(VENV_DIR, ".installed-v3")
+# Cópias dos modelos do rembg com eixo de lote dinâmico (ver batched_model_path).
+MODELS_DIR = os.path.join(VENV_DIR, "models")
 
 def ensure_venv():
     if not os.path.exists(PYTHON_BIN):
         print("🔧 Criando ambiente isolado...")
         subprocess.check_call([sys.executable, "-m", "venv", VENV_DIR])
+    if os.path.exists(DEPS_STAMP):
+        return
     print("📦 Instalando/atualizando dependências no venv...")
     subprocess.check_call([PYTHON_BIN, "-m", "pip", "install", "--upgrade", "pip"])
     subprocess.check_call([
         PYTHON_BIN, "-m", "pip", "install",
-        "rembg", "pillow", "onnxruntime", "tkinterdnd2"
+        "rembg", "pillow", "onnxruntime", "onnx", "tkinterdnd2", "deflate"
     ])
+    Path(DEPS_STAMP).touch()
 
 def restart_in_venv():
-    if sys.executable != PYTHON_BIN:
-        print("🔄 Reiniciando dentro do venv...")
-        os.execv(PYTHON_BIN, [PYTHON_BIN] + sys.argv)
+    print("🔄 Reiniciando dentro do venv...")
+    os.execv(PYTHON_BIN, [PYTHON_BIN] + sys.argv)
 
-# Executa etapa de venv -> reinicia no venv automaticamente.
-ensure_venv()
-restart_in_venv()
+# Fora do venv: prepara o ambiente e reinicia nele. Já dentro dele (caso normal
+# depois do primeiro exec), segue direto sem checar nada.
+if sys.executable != PYTHON_BIN:
+    ensure_venv()
+    restart_in_venv()
 
 # ---------------------------
 # Imports (agora já dentro do venv)
 # ---------------------------
-from rembg import remove
-from PIL import Image, ImageTk
+import threading
+import queue
+import collections
+import math
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from rembg.sessions import sessions_class
+from PIL import Image, ImageDraw, ImageFont, ImageOps, ImageTk
+import numpy as np
+import onnxruntime as ort
+import onnx
+from onnx.tools.update_model_dims import update_inputs_outputs_dims
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinterdnd2 import TkinterDnD, DND_FILES
+try:
+    import deflate  # libdeflate: ~2x mais rápido que o zlib no mesmo nível
+except ImportError:
+    deflate = None
 
 SUPPORTED_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tiff", ".tif"}
+_EXT_SUFFIXES = tuple(SUPPORTED_EXTS)  # para str.endswith
+
+# Parâmetros de entrada do U²-Net (os mesmos usados internamente pelo rembg)
+MODEL_SIZE = (320, 320)
+MODEL_MEAN = np.array((0.485, 0.456, 0.406), dtype=np.float32)
+MODEL_STD = np.array((0.229, 0.224, 0.225), dtype=np.float32)
+BATCH_SIZE = 4
+# Fotos maiores que isso são reduzidas por média de blocos (barato) antes do LANCZOS
+# para MODEL_SIZE; o modelo só vê 320x320, então a máscara não perde qualidade.
+MAX_INFER_SIDE = 1024
+# Modelos do rembg: u2netp tem ~4x menos FLOPs que o u2net, com recorte um pouco menos fino.
+MODEL_NAME = "u2net"
+FAST_MODEL_NAME = "u2netp"
+# Sem psutil, estima os núcleos físicos como metade dos lógicos (SMT de 2 vias).
+PHYSICAL_CORES = max(1, (os.cpu_count() or 2) // 2)
+# Threads de decodificação/codificação por estágio do pipeline.
+WORKERS = PHYSICAL_CORES
+# Threads chamando session.run; todas dividem o mesmo pool intra-op da sessão,
+# então 2 bastam para emendar um lote no outro sem disputar núcleos.
+INFER_WORKERS = 2
+# Nível zlib do PNG: 1 grava várias vezes mais rápido que o padrão 6, com arquivo um pouco maior.
+FAST_PNG_LEVEL = 1
+DEFAULT_PNG_LEVEL = 6
+WRITERS = 2  # threads só para gravar os PNGs já codificados no disco
+PIPELINE_QUEUE_SIZE = 8  # limita quantas imagens decodificadas ficam em memória
+BATCH_TIMEOUT = 0.05     # segundos esperando completar um lote antes de rodar o que já chegou
+UI_FLUSH_MS = 100        # intervalo em que log e progresso acumulados pelas threads vão para a tela
 
 # ---------------------------
 # Processamento de imagem
 # ---------------------------
-def process_image(in_path: Path, out_dir: Path) -> Path:
-    """Remove fundo e recorta até o limite da informação (bbox dos pixels não transparentes)."""
-    out_dir.mkdir(parents=True, exist_ok=True)
-    with Image.open(in_path).convert("RGBA") as im:
-        out = remove(im)
-        bbox = out.getbbox()
-        if bbox:
-            out = out.crop(bbox)
-        base = in_path.stem
-        out_path = out_dir / f"{base}_nobg.png"
-        out.save(out_path, format="PNG")
-        return out_path
+def pick_providers() -> list:
+    """Execution providers em ordem de preferência: CUDA, CoreML (macOS) e, por fim, CPU."""
+    available = ort.get_available_providers()
+    if "CUDAExecutionProvider" in available:
+        return ["CUDAExecutionProvider", "CPUExecutionProvider"]
+    if "CoreMLExecutionProvider" in available:
+        # MLProgram permite ao CoreML enviar as convoluções para o Neural Engine.
+        return [("CoreMLExecutionProvider", {"ModelFormat": "MLProgram"}), "CPUExecutionProvider"]
+    return ["CPUExecutionProvider"]
+
+def model_path(model_name: str) -> str:
+    """Caminho do .onnx de um modelo do rembg, baixando-o na primeira vez."""
+    for session_class in sessions_class:
+        if session_class.name() == model_name:
+            return session_class.download_models()
+    raise ValueError(f"Modelo desconhecido: {model_name}")
+
+def _value_dims(value_info, batch=None) -> list:
+    """Dimensões de um input/output do grafo; -1 onde a forma não é conhecida."""
+    dims = []
+    for d in value_info.type.tensor_type.shape.dim:
+        if d.HasField("dim_param"):
+            dims.append(d.dim_param)
+        elif d.HasField("dim_value"):
+            dims.append(d.dim_value)
+        else:
+            dims.append(-1)
+    if batch is not None and dims:
+        dims[0] = batch
+    return dims
+
+def batched_model_path(model_file: str):
+    """Cópia do modelo com o eixo de lote simbólico ('N'), criada uma vez em MODELS_DIR.
+
+    Os .onnx do rembg declaram lote fixo em 1; basta reescrever a dimensão 0 dos
+    inputs/outputs. A cópia só é usada se rodar um lote de 2 de verdade; senão um
+    marcador .failed evita repetir a tentativa e devolve None (lote 1).
+    """
+    stem = Path(model_file).stem
+    out = Path(MODELS_DIR) / f"{stem}.batch.onnx"
+    failed = out.with_suffix(".failed")
+    source_mtime = os.path.getmtime(model_file)
+    if out.exists() and out.stat().st_mtime >= source_mtime:
+        return str(out)
+    if failed.exists() and failed.stat().st_mtime >= source_mtime:
+        return None
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(".tmp")
+    try:
+        model = onnx.load(model_file)
+        weights = {init.name for init in model.graph.initializer}
+        input_dims = {
+            v.name: _value_dims(v, None if v.name in weights else "N") for v in model.graph.input
+        }
+        output_dims = {v.name: _value_dims(v, "N") for v in model.graph.output}
+        del model.graph.value_info[:]  # formas intermediárias com lote 1 deixam de valer
+        onnx.save(update_inputs_outputs_dims(model, input_dims, output_dims), str(tmp))
+        probe_opts = ort.SessionOptions()
+        probe_opts.log_severity_level = 4  # a falha esperada não deve sujar o terminal
+        probe = ort.InferenceSession(str(tmp), sess_options=probe_opts, providers=["CPUExecutionProvider"])
+        batch = np.zeros((2, 3, MODEL_SIZE[1], MODEL_SIZE[0]), dtype=np.float32)
+        if probe.run(None, {probe.get_inputs()[0].name: batch})[0].shape[0] != 2:
+            raise ValueError("o modelo não devolveu um resultado por imagem")
+        del probe
+        os.replace(tmp, out)
+        return str(out)
+    except Exception:
+        # Ex.: um Reshape com o lote fixo no grafo; segue com o modelo original.
+        failed.touch()
+        tmp.unlink(missing_ok=True)
+        return None
+
+def load_model(model_name: str = MODEL_NAME):
+    """Carrega o modelo do rembg (baixando se preciso) como InferenceSession do onnxruntime.
+
+    A sessão é compartilhada pelas threads de INFER_WORKERS (session.run é thread-safe),
+    com fusões de grafo completas e um pool intra-op do tamanho dos núcleos físicos.
+    """
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    opts.intra_op_num_threads = PHYSICAL_CORES
+    opts.inter_op_num_threads = 1
+    opts.enable_cpu_mem_arena = True
+    opts.add_session_config_entry("session.intra_op.allow_spinning", "1")
+    path = model_path(model_name)
+    path = batched_model_path(path) or path
+    return ort.InferenceSession(path, sess_options=opts, providers=pick_providers())
+
+def model_batch_size(session) -> int:
+    """Quantas imagens cabem em uma única chamada de `session.run`.
+
+    Com eixo de lote dinâmico (dim_param='N', ver batched_model_path) usa BATCH_SIZE;
+    se o lote é fixo, respeita o valor.
+    """
+    dim = session.get_inputs()[0].shape[0]
+    return dim if isinstance(dim, int) and dim > 0 else BATCH_SIZE
+
+def preprocess(im: Image.Image) -> np.ndarray:
+    """Redimensiona e normaliza a imagem RGB no tensor CHW esperado pelo modelo."""
+    factor = max(im.size) // MAX_INFER_SIDE
+    if factor > 1:
+        im = im.reduce(factor)
+    arr = np.array(im.resize(MODEL_SIZE, Image.LANCZOS), dtype=np.float32)
+    # Operações in-place: nenhum temporário float além do próprio tensor.
+    arr /= max(float(arr.max()), 1e-6)
+    arr -= MODEL_MEAN
+    arr /= MODEL_STD
+    return arr.transpose(2, 0, 1)
+
+class BatchRunner:
+    """Roda lotes na sessão via IOBinding, com buffers de entrada e saída pré-alocados.
+
+    Cada thread de inferência tem o seu: os buffers são reescritos a cada lote,
+    então o resultado de run() só vale até a próxima chamada.
+    """
+
+    def __init__(self, session, batch_size: int):
+        self.session = session
+        inp, out = session.get_inputs()[0], session.get_outputs()[0]
+        self.input_name, self.output_name = inp.name, out.name
+        self.input_buf = np.empty((batch_size, 3, MODEL_SIZE[1], MODEL_SIZE[0]), dtype=np.float32)
+        # Só dá para pré-alocar a saída se o modelo declara as dimensões dela.
+        out_dims = out.shape[1:]
+        if all(isinstance(d, int) for d in out_dims):
+            self.output_buf = np.empty((batch_size, *out_dims), dtype=np.float32)
+        else:
+            self.output_buf = None
+        self.binding = session.io_binding()
+
+    def run(self, tensors: list) -> np.ndarray:
+        """Roda um lote de tensores de preprocess com um único run; devolve (N, H, W)."""
+        n = len(tensors)
+        for i, tensor in enumerate(tensors):
+            self.input_buf[i] = tensor
+        self.binding.bind_cpu_input(self.input_name, self.input_buf[:n])
+        if self.output_buf is not None:
+            out = self.output_buf[:n]
+            self.binding.bind_output(self.output_name, "cpu", 0, np.float32, list(out.shape), out.ctypes.data)
+        else:
+            self.binding.bind_output(self.output_name, "cpu")
+        self.session.run_with_iobinding(self.binding)
+        if self.output_buf is None:
+            out = self.binding.copy_outputs_to_cpu()[0]
+        return out[:, 0]
+
+def preds_to_masks(preds: np.ndarray) -> np.ndarray:
+    """Normaliza cada predição (N, H, W) do lote para máscaras uint8 de 0 a 255.
+
+    Min/max por imagem e a escala são aplicados ao lote inteiro com ufuncs, sem laço
+    em Python; devolve um array novo, independente do buffer de saída do modelo.
+    """
+    mi = preds.min(axis=(1, 2), keepdims=True)
+    rng = np.maximum(preds.max(axis=(1, 2), keepdims=True) - mi, 1e-6)
+    scaled = preds - mi
+    scaled *= 255 / rng
+    np.clip(scaled, 0, 255, out=scaled)
+    return scaled.astype(np.uint8)
+
+def resize_mask(mask: np.ndarray, size: tuple) -> np.ndarray:
+    """Amplia a máscara do modelo para o tamanho (w, h) da imagem original."""
+    # BICUBIC: em fotos de dezenas de megapixels custa bem menos que LANCZOS, e a
+    # máscara de 320x320 não tem detalhe que um filtro mais largo preservaria.
+    return np.asarray(Image.fromarray(mask).resize(size, Image.BICUBIC))
+
+def alpha_bbox(alpha: np.ndarray):
+    """Bbox (x1, y1, x2, y2) dos pixels com alfa > 0, ou None se tudo for transparente.
+
+    Olha só o plano alfa, em vez das 4 bandas percorridas por Image.getbbox().
+    """
+    rows = np.any(alpha, axis=1)
+    if not rows.any():
+        return None
+    cols = np.any(alpha, axis=0)
+    y1 = int(rows.argmax())
+    y2 = len(rows) - int(rows[::-1].argmax())
+    x1 = int(cols.argmax())
+    x2 = len(cols) - int(cols[::-1].argmax())
+    return x1, y1, x2, y2
+
+_scratch = threading.local()
+
+def scanline_buffer(h: int, w: int) -> np.ndarray:
+    """Linhas PNG RGBA (byte de filtro + w*4) reaproveitadas na mesma thread (cresce se preciso)."""
+    n = h * (w * 4 + 1)
+    buf = getattr(_scratch, "scanlines", None)
+    if buf is None or buf.size < n:
+        buf = _scratch.scanlines = np.empty(n, dtype=np.uint8)
+    return buf[:n].reshape(h, w * 4 + 1)
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+def encode_png(rgb: np.ndarray, alpha: np.ndarray, compress_level: int) -> bytes:
+    """Monta um PNG RGBA de 8 bits (IHDR + IDAT + IEND) a partir do RGB e do alfa.
+
+    Todas as linhas usam o filtro Sub, calculado com NumPy, e o IDAT é comprimido
+    pela libdeflate quando disponível (senão, zlib).
+    """
+    h, w = alpha.shape
+    lines = scanline_buffer(h, w)
+    px = lines[:, 1:].reshape(h, w, 4)
+    px[..., :3] = rgb
+    px[..., 3] = alpha
+    # Como o naive_cutout do rembg: o fundo removido não fica guardado sob alfa 0
+    # (reapareceria se o alfa fosse descartado) e as áreas zeradas comprimem melhor.
+    px[..., :3] *= (alpha > 0)[..., None]
+    lines[:, 0] = 1  # filtro Sub: cada byte menos o do pixel à esquerda
+    lines[:, 5:] -= lines[:, 1:-4]
+    if deflate is not None:
+        idat = deflate.zlib_compress(lines, compress_level)
+    else:
+        idat = zlib.compress(lines, compress_level)
+    ihdr = struct.pack(">IIBBBBB", w, h, 8, 6, 0, 0, 0)  # 8 bits, RGBA
+    return b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", ihdr) + _png_chunk(b"IDAT", idat) + _png_chunk(b"IEND", b"")
+
+def encode_cutout(rgb: np.ndarray, mask: np.ndarray, compress_level: int = FAST_PNG_LEVEL) -> bytes:
+    """Aplica a máscara como alfa, recorta até o bbox dos pixels visíveis e devolve o PNG."""
+    bbox = alpha_bbox(mask)
+    if bbox:
+        x1, y1, x2, y2 = bbox
+        rgb, mask = rgb[y1:y2, x1:x2], mask[y1:y2, x1:x2]
+    # Recorta antes de montar o RGBA: só a região útil é copiada.
+    return encode_png(rgb, mask, compress_level)
+
+def output_paths(in_paths: list, out_dir: Path) -> dict:
+    """Mapeia cada entrada para "<nome>_nobg.png" em out_dir.
+
+    Pastas varridas recursivamente repetem nomes (a/IMG_0001.jpg, b/IMG_0001.jpg);
+    as repetições ganham "_nobg_2", "_nobg_3"... em vez de sobrescrever umas às outras.
+    A comparação ignora maiúsculas, como nos sistemas de arquivos do Windows e do macOS.
+    """
+    used = set()
+    targets = {}
+    for p in sorted(in_paths):
+        name = f"{p.stem}_nobg.png"
+        n = 1
+        while name.casefold() in used:
+            n += 1
+            name = f"{p.stem}_nobg_{n}.png"
+        used.add(name.casefold())
+        targets[p] = out_dir / name
+    return targets
+
+def write_file(path: Path, data: bytes) -> Path:
+    """Grava num temporário da mesma pasta e troca de uma vez: nunca fica um PNG pela metade."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return path
+
+def load_image(in_path: Path) -> tuple:
+    """Decodifica a imagem uma única vez: devolve (RGB uint8 HxWx3, alfa da origem ou None,
+    tensor de preprocess).
+
+    Como o rembg.remove(), aplica a orientação EXIF e preserva a transparência da origem,
+    que depois é combinada com a máscara (combine_alpha).
+    """
+    with Image.open(in_path) as im:
+        im.load()
+        ImageOps.exif_transpose(im, in_place=True)
+        alpha = None
+        if im.has_transparency_data:
+            if im.mode != "RGBA":
+                im = im.convert("RGBA")
+            alpha = np.asarray(im.getchannel("A"))
+        # convert() sempre copia; só é necessário quando a origem não é RGB.
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        return np.asarray(im), alpha, preprocess(im)
+
+def combine_alpha(mask: np.ndarray, alpha) -> np.ndarray:
+    """Multiplica a máscara do modelo pelo alfa da origem (se houver)."""
+    if alpha is None:
+        return mask
+    return (mask.astype(np.uint16) * alpha // 255).astype(np.uint8)
+
+def file_size(p: Path) -> int:
+    try:
+        return p.stat().st_size
+    except OSError:
+        return 0  # o erro aparece no log quando a imagem for aberta
 
 def iter_images_in_dir(folder: Path):
-    for p in folder.rglob("*"):
-        if p.suffix.lower() in SUPPORTED_EXTS:
-            yield p
+    """Percorre a pasta recursivamente com os.walk, criando Path só para as imagens."""
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.lower().endswith(_EXT_SUFFIXES):
+                yield Path(root, name)
 
 # ---------------------------
 # Utilitários de desenho (rounded rect)
 # ---------------------------
+def load_bold_font(size: int):
+    """Fonte em negrito para desenhar com PIL; usa a padrão se Arial/DejaVu não existirem."""
+    for name in ("arialbd.ttf", "Arial Bold.ttf", "DejaVuSans-Bold.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+def rounded_rect_points(x1, y1, x2, y2, r, samples=8):
+    """Contorno (x, y, x, y, ...) de um retângulo arredondado, com `samples` pontos por canto."""
+    corners = ((x2-r, y1+r, -90), (x2-r, y2-r, 0), (x1+r, y2-r, 90), (x1+r, y1+r, 180))
+    points = []
+    for cx, cy, start in corners:
+        for i in range(samples):
+            a = math.radians(start + 90 * i / (samples - 1))
+            points += [cx + r * math.cos(a), cy + r * math.sin(a)]
+    return points
+
 def create_rounded_rect(canvas, x1, y1, x2, y2, r, **kwargs):
-    """Desenha um retângulo com cantos arredondados no Canvas."""
-    canvas.create_rectangle(x1+r, y1, x2-r, y2, **kwargs)
-    canvas.create_rectangle(x1, y1+r, x2, y2-r, **kwargs)
-    canvas.create_arc(x2-2*r, y1, x2, y1+2*r, start=0, extent=90, style='pieslice', **kwargs)
-    canvas.create_arc(x1, y1, x1+2*r, y1+2*r, start=90, extent=90, style='pieslice', **kwargs)
-    canvas.create_arc(x1, y2-2*r, x1+2*r, y2, start=180, extent=90, style='pieslice', **kwargs)
-    canvas.create_arc(x2-2*r, y2-2*r, x2, y2, start=270, extent=90, style='pieslice', **kwargs)
+    """Desenha um retângulo com cantos arredondados no Canvas (um único polígono)."""
+    return canvas.create_polygon(rounded_rect_points(x1, y1, x2, y2, r), **kwargs)
 
 def create_rounded_rect_outline(canvas, x1, y1, x2, y2, r, dash=None, width=1, outline="#666"):
-    """Desenha contorno arredondado (pontilhado opcional)."""
-    canvas.create_arc(x2-2*r, y1, x2, y1+2*r, start=0, extent=90, style='arc', outline=outline, width=width, dash=dash)
-    canvas.create_arc(x1, y1, x1+2*r, y1+2*r, start=90, extent=90, style='arc', outline=outline, width=width, dash=dash)
-    canvas.create_arc(x1, y2-2*r, x1+2*r, y2, start=180, extent=90, style='arc', outline=outline, width=width, dash=dash)
-    canvas.create_arc(x2-2*r, y2-2*r, x2, y2, start=270, extent=90, style='arc', outline=outline, width=width, dash=dash)
-    canvas.create_line(x1+r, y1, x2-r, y1, fill=outline, width=width, dash=dash)
-    canvas.create_line(x1+r, y2, x2-r, y2, fill=outline, width=width, dash=dash)
-    canvas.create_line(x1, y1+r, x1, y2-r, fill=outline, width=width, dash=dash)
-    canvas.create_line(x2, y1+r, x2, y2-r, fill=outline, width=width, dash=dash)
+    """Desenha contorno arredondado (pontilhado opcional) como uma única linha fechada."""
+    points = rounded_rect_points(x1, y1, x2, y2, r)
+    return canvas.create_line(*points, *points[:2], fill=outline, width=width, dash=dash)
 
 # ---------------------------
 # UI principal
@@ -107,7 +442,19 @@ class NoBackApp(TkinterDnD.Tk):
         self.output_dir = Path.home() / "Downloads"
         self.logo_img = None
         self.flag_img = None
+        self._btn_cache = {}  # (texto, bg, fg, w, h) -> PhotoImage dos botões
+        self._sessions = {}  # nome do modelo -> sessão, criada sob demanda
+        self.fast_model = tk.BooleanVar(value=False)
+        self.fast_save = tk.BooleanVar(value=True)
+        # Log/progresso produzidos pelas threads; a thread do Tk despeja em _flush_ui.
+        self._ui_lock = threading.Lock()
+        self._pending_logs = collections.deque()
+        self._pending_done = 0
+        self._total = 0
+        self._done = 0
+        self._running = False  # True enquanto _process_all roda; evita duas execuções simultâneas
         self._build_ui()
+        self.after(UI_FLUSH_MS, self._flush_ui)
 
         try:
             self.drop_target_register(DND_FILES)
@@ -173,6 +520,24 @@ class NoBackApp(TkinterDnD.Tk):
         path_display.pack(fill="x", pady=(6,0))
         path_display.insert(0, str(self.output_dir))
         self.out_entry = path_display
+        tk.Checkbutton(
+            out_frame,
+            text="Modelo rápido (u2netp, recorte menos preciso)",
+            variable=self.fast_model,
+            font=("Arial", 11),
+            bg="#e9e9e9",
+            activebackground="#e9e9e9",
+            highlightthickness=0
+        ).pack(anchor="w", pady=(8,0))
+        tk.Checkbutton(
+            out_frame,
+            text="Salvamento rápido (PNG um pouco maior)",
+            variable=self.fast_save,
+            font=("Arial", 11),
+            bg="#e9e9e9",
+            activebackground="#e9e9e9",
+            highlightthickness=0
+        ).pack(anchor="w")
 
         # Progresso
         prog_frame = tk.Frame(self, bg="#e9e9e9")
@@ -202,15 +567,24 @@ class NoBackApp(TkinterDnD.Tk):
         self.update_idletasks()
         self.geometry(self.geometry())
 
+    def _make_button_image(self, text, bg, fg, w, h):
+        """Renderiza o botão arredondado uma única vez como bitmap (cache por aparência)."""
+        key = (text, bg, fg, w, h)
+        if key not in self._btn_cache:
+            ss = 4  # desenha em escala maior e reduz, para suavizar as bordas
+            im = Image.new("RGB", (w * ss, h * ss), self["bg"])
+            draw = ImageDraw.Draw(im)
+            draw.rounded_rectangle((2 * ss, 2 * ss, (w - 2) * ss, (h - 2) * ss), radius=h // 2 * ss, fill=bg)
+            font = load_bold_font(round(self.winfo_fpixels("11p") * ss))
+            draw.text((w * ss / 2, h * ss / 2), text, font=font, fill=fg, anchor="mm")
+            self._btn_cache[key] = ImageTk.PhotoImage(im.resize((w, h), Image.LANCZOS))
+        return self._btn_cache[key]
+
     def _create_button(self, parent, text, command, bg="#66aaff", fg="white", width=160, height=48):
-        c = tk.Canvas(parent, width=width, height=height, bg=self["bg"], highlightthickness=0)
-        radius = int(height/2)
-        create_rounded_rect(c, 2, 2, width-2, height-2, radius, fill=bg, outline="")
-        c.create_text(width/2, height/2, text=text, font=("Arial", 11, "bold"), fill=fg)
-        c.bind("<Button-1>", lambda e: command())
-        c.bind("<Enter>", lambda e: c.config(cursor="hand2"))
-        c.bind("<Leave>", lambda e: c.config(cursor=""))
-        return c
+        img = self._make_button_image(text, bg, fg, width, height)
+        b = tk.Label(parent, image=img, bg=self["bg"], bd=0, cursor="hand2")
+        b.bind("<Button-1>", lambda e: command())
+        return b
 
     # Helpers
     def append_log(self, text: str):
@@ -222,7 +596,7 @@ class NoBackApp(TkinterDnD.Tk):
     def set_progress(self, fraction: float):
         w = max(0, min(1, fraction)) * self.pb_w
         self.pb_canvas.coords(self.pb_bar, 0, 0, w, self.pb_h)
-        pct = int(round(fraction * 100))
+        pct = int(round(max(0, min(1, fraction)) * 100))
         self.pb_canvas.itemconfigure(self.pb_text, text=f"{pct}%")
         self.pb_canvas.update_idletasks()
 
@@ -266,29 +640,187 @@ class NoBackApp(TkinterDnD.Tk):
 
     # Processamento em thread
     def start_process(self):
+        if self._running:
+            messagebox.showinfo("Atenção", "Já existe um processamento em andamento.")
+            return
         if not self.input_paths:
             messagebox.showwarning("Atenção", "Selecione arquivos ou uma pasta primeiro.")
             return
         if not self.output_dir:
             messagebox.showwarning("Atenção", "Selecione a pasta de saída.")
             return
-        t = threading.Thread(target=self._process_all, daemon=True)
+        # Pasta + arquivos soltos podem repetir caminhos; menores primeiro para o
+        # progresso andar logo e os arquivos grandes ficarem juntos no final.
+        # A thread recebe cópias: escolher/soltar arquivos durante a execução não a afeta.
+        paths = self.input_paths = sorted(dict.fromkeys(self.input_paths), key=file_size)
+        out_dir = self.output_dir
+        model_name = FAST_MODEL_NAME if self.fast_model.get() else MODEL_NAME
+        compress_level = FAST_PNG_LEVEL if self.fast_save.get() else DEFAULT_PNG_LEVEL
+        self._running = True
+        with self._ui_lock:
+            self._pending_done = 0
+        self._total = len(paths)
+        self._done = 0
+        self.set_progress(0.0)
+        t = threading.Thread(target=self._process_all, args=(list(paths), out_dir, model_name, compress_level),
+                             daemon=True)
         t.start()
 
-    def _process_all(self):
-        total = len(self.input_paths)
-        self.append_log(f"{total} arquivo(s) a processar.")
-        self.set_progress(0.0)
-        for idx, p in enumerate(self.input_paths, start=1):
+    def _log(self, text: str):
+        """append_log seguro para chamar a partir das threads de processamento."""
+        with self._ui_lock:
+            self._pending_logs.append(text)
+
+    def _advance(self):
+        """Conta uma imagem finalizada (com sucesso ou erro)."""
+        with self._ui_lock:
+            self._pending_done += 1
+
+    def _fail(self, p: Path, e: Exception):
+        self._log(f"✗ Erro em {p.name}: {e}")
+        self._advance()
+
+    def _flush_ui(self):
+        """Aplica de uma vez o log e o progresso acumulados; reagenda a cada UI_FLUSH_MS."""
+        with self._ui_lock:
+            lines = list(self._pending_logs)
+            self._pending_logs.clear()
+            done, self._pending_done = self._pending_done, 0
+        if lines:
+            self.append_log("\n".join(lines))
+        if done:
+            self._done += done
+            self.set_progress(self._done / self._total)
+        self.after(UI_FLUSH_MS, self._flush_ui)
+
+    # Pipeline: decodificação -> inferência -> codificação, ligados por filas limitadas,
+    # para o onnxruntime não ficar ocioso enquanto PNGs são lidos e gravados.
+    def _decode_worker(self, in_q: queue.Queue, out_q: queue.Queue):
+        while True:
+            p = in_q.get()
+            if p is None:
+                return
+            try:
+                self._log(f"Processando: {p.name} ...")
+                out_q.put((p, *load_image(p)))
+            except Exception as e:
+                self._fail(p, e)
+
+    def _infer_worker(self, session, batch_size: int, in_q: queue.Queue, out_q: queue.Queue):
+        runner = None
+        finished = False
+        while not finished:
+            item = in_q.get()
+            if item is None:
+                return
+            # Junta até batch_size imagens, sem esperar mais que BATCH_TIMEOUT por cada uma.
+            batch = [item]
+            while len(batch) < batch_size:
+                try:
+                    item = in_q.get(timeout=BATCH_TIMEOUT)
+                except queue.Empty:
+                    break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
             try:
-                self.append_log(f"Processando: {p.name} ...")
-                out = process_image(p, self.output_dir)
-                self.append_log(f"✓ {p.name} → {out.name}")
+                # Criado aqui para que uma falha ao alocar os buffers só derrube este lote;
+                # a fila continua sendo consumida e os estágios seguintes terminam.
+                if runner is None:
+                    runner = BatchRunner(session, batch_size)
+                masks = preds_to_masks(runner.run([tensor for _, _, _, tensor in batch]))
             except Exception as e:
-                self.append_log(f"✗ Erro em {p.name}: {e}")
-            self.set_progress(idx / total)
-        self.append_log("🎉 Concluído!")
-        self.set_progress(1.0)
+                for p, _, _, _ in batch:
+                    self._fail(p, e)
+                continue
+            for (p, rgb, alpha, _), mask in zip(batch, masks):
+                out_q.put((p, rgb, alpha, mask))
+
+    def _encode_worker(self, in_q: queue.Queue, targets: dict, compress_level: int, writer: ThreadPoolExecutor,
+                       write_slots: threading.BoundedSemaphore):
+        while True:
+            item = in_q.get()
+            if item is None:
+                return
+            p, rgb, alpha, mask = item
+            try:
+                mask = combine_alpha(resize_mask(mask, (rgb.shape[1], rgb.shape[0])), alpha)
+                data = encode_cutout(rgb, mask, compress_level)
+                # A gravação fica com o writer; esta thread já segue para a próxima imagem,
+                # a menos que PIPELINE_QUEUE_SIZE PNGs já estejam esperando o disco.
+                write_slots.acquire()
+                try:
+                    future = writer.submit(write_file, targets[p], data)
+                except BaseException:
+                    write_slots.release()
+                    raise
+                future.add_done_callback(lambda f, p=p: self._written(p, f, write_slots))
+            except Exception as e:
+                self._fail(p, e)
+
+    def _written(self, p: Path, future, write_slots: threading.BoundedSemaphore):
+        write_slots.release()
+        try:
+            out = future.result()
+        except Exception as e:
+            self._fail(p, e)
+            return
+        self._log(f"✓ {p.name} → {out.name}")
+        self._advance()
+
+    def _start_stage(self, count: int, target, *args) -> list:
+        threads = [threading.Thread(target=target, args=args, daemon=True) for _ in range(count)]
+        for t in threads:
+            t.start()
+        return threads
+
+    def _process_all(self, paths: list, out_dir: Path, model_name: str, compress_level: int):
+        try:
+            total = len(paths)
+            self._log(f"{total} arquivo(s) a processar.")
+            session = self._sessions.get(model_name)
+            if session is None:
+                self._log(f"Carregando modelo {model_name}...")
+                try:
+                    session = self._sessions[model_name] = load_model(model_name)
+                except Exception as e:
+                    # Ex.: sem internet no primeiro download do modelo.
+                    self._log(f"✗ Erro ao carregar modelo {model_name}: {e}")
+                    for p in paths:
+                        self._fail(p, e)
+                    self._log("Processamento interrompido.")
+                    return
+                self._log(f"Executando em: {session.get_providers()[0]}")
+            batch_size = model_batch_size(session)
+            self._log(f"Lotes de até {batch_size} imagem(ns) por execução do modelo.")
+
+            targets = output_paths(paths, out_dir)
+            # A fila do ThreadPoolExecutor não tem limite; isto segura a memória se o disco for lento.
+            write_slots = threading.BoundedSemaphore(PIPELINE_QUEUE_SIZE)
+            paths_q = queue.Queue()
+            decoded_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            masked_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            for p in paths:
+                paths_q.put(p)
+            for _ in range(WORKERS):
+                paths_q.put(None)
+            with ThreadPoolExecutor(max_workers=WRITERS) as writer:
+                decoders = self._start_stage(WORKERS, self._decode_worker, paths_q, decoded_q)
+                inferers = self._start_stage(INFER_WORKERS, self._infer_worker, session, batch_size, decoded_q, masked_q)
+                encoders = self._start_stage(WORKERS, self._encode_worker, masked_q, targets, compress_level, writer,
+                                             write_slots)
+                # Cada estágio só recebe os sentinelas (None) depois que o anterior esvaziou.
+                for stage, out_q, consumers in ((decoders, decoded_q, INFER_WORKERS), (inferers, masked_q, WORKERS)):
+                    for t in stage:
+                        t.join()
+                    for _ in range(consumers):
+                        out_q.put(None)
+                for t in encoders:
+                    t.join()
+            self._log("🎉 Concluído!")
+        finally:
+            self._running = False
 
 # ---------------------------
 # Main
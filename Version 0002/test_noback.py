@@ -0,0 +1,53 @@
+"""
+Testes do noback.py. Rode dentro do venv criado pelo próprio app:
+  ~/.noback_venv/bin/python3 -m unittest discover -s "Version 0002"
+"""
+import io
+import os
+import sys
+import unittest
+from pathlib import Path
+
+# Fora do venv, importar o noback instalaria as dependências e reiniciaria o processo.
+if sys.executable != os.path.expanduser("~/.noback_venv/bin/python3"):
+    raise unittest.SkipTest("rode com o python do ~/.noback_venv")
+
+import numpy as np
+from PIL import Image
+
+import noback
+
+
+class EncodeCutoutTest(unittest.TestCase):
+    def decode(self, data: bytes) -> np.ndarray:
+        with Image.open(io.BytesIO(data)) as im:
+            self.assertEqual(im.mode, "RGBA")
+            return np.asarray(im)
+
+    def test_rgb_is_zero_under_transparent_pixels(self):
+        rgb = np.full((40, 60, 3), 200, dtype=np.uint8)
+        rgb[..., 1] = np.arange(60, dtype=np.uint8)
+        mask = np.zeros((40, 60), dtype=np.uint8)
+        mask[5:35, 10:50] = 255
+        mask[15:25, 20:30] = 0    # buraco dentro do bbox
+        mask[5:35, 10] = 128      # borda semitransparente
+        px = self.decode(noback.encode_cutout(rgb, mask, noback.FAST_PNG_LEVEL))
+        crop_rgb, crop_mask = rgb[5:35, 10:50], mask[5:35, 10:50]
+        np.testing.assert_array_equal(px[..., 3], crop_mask)
+        self.assertFalse(px[..., :3][crop_mask == 0].any())
+        np.testing.assert_array_equal(px[..., :3][crop_mask > 0], crop_rgb[crop_mask > 0])
+
+
+class OutputPathsTest(unittest.TestCase):
+    def test_repeated_stems_get_unique_names(self):
+        out = Path("/saida")
+        paths = [Path("b/IMG_0001.jpg"), Path("a/IMG_0001.png"), Path("c/img_0001.JPG"), Path("foto.png")]
+        targets = noback.output_paths(paths, out)
+        self.assertEqual(targets[Path("a/IMG_0001.png")], out / "IMG_0001_nobg.png")
+        self.assertEqual(targets[Path("b/IMG_0001.jpg")], out / "IMG_0001_nobg_2.png")
+        self.assertEqual(targets[Path("c/img_0001.JPG")], out / "img_0001_nobg_3.png")
+        self.assertEqual(targets[Path("foto.png")], out / "foto_nobg.png")
+
+
+if __name__ == "__main__":
+    unittest.main()